@@ -20,23 +20,56 @@
 
 import os
 import sys
+import threading
+from pathlib import Path
 from PyQt5.QtWidgets import (
     QApplication, QMainWindow, QWidget,
     QVBoxLayout, QLabel, QPushButton, QMessageBox,
     QFileDialog, QAction
 )
 from PyQt5.QtGui import QPixmap, QFont, QIcon, QDesktopServices
-from PyQt5.QtCore import Qt, QUrl
+from PyQt5.QtCore import Qt, QUrl, QRunnable, QThreadPool, QElapsedTimer
 
-# V3 stuff
-import pdfkit
-from lxml import etree
+# The pdf generation functions (and lxml with them) are imported where they
+# are used, so just opening the viewer does not load them
 
-# Import from the pdf generation functions
-from pdfGenerationFunctions import xml_to_html, html_to_pdf, xml_to_pdf
+# Keep the file pickers from probing every file for icons/links (slow on network drives)
+FILE_DIALOG_OPTIONS = (
+    QFileDialog.DontUseCustomDirectoryIcons
+    | QFileDialog.DontResolveSymlinks
+    | QFileDialog.HideNameFilterDetails
+)
+
+# The stylesheet used to render the PDF (resolved with resource_path)
+XSL_FILE = "FTSConfigViewer.xsl"
+
+# Set to True to keep the merged XML in C:\temp\FTSViewer for debugging
+SAVE_MERGED_XML = False
+
+# Set to True to print how long the window takes to open
+TIME_STARTUP = False
+
+class WarmUpTask(QRunnable):
+    """
+    Starts wkhtmltopdf and compiles the stylesheet off the UI thread,
+    then signals that PDF generation is ready.
+    """
+    def __init__(self, ready):
+        super().__init__()
+        self.ready = ready
+
+    def run(self):
+        try:
+            from pdfGenerationFunctions import resource_path, warm_up
+            warm_up(resource_path(XSL_FILE))
+        finally:
+            self.ready.set()
 
 
 class MainWindow(QMainWindow):
+    # The scaled logo, decoded once and shared by every window
+    _logo = None
+
     def __init__(self):
         super().__init__()
 
@@ -65,9 +98,14 @@ class MainWindow(QMainWindow):
             }"""
         )
 
+        # The loaded file paths, keyed by kind ('xml' or 'evr')
+        self._paths = {}
+
         # Call the method to set up the UI layout
         self.setup_ui()
 
+        # Set once PDF generation has been warmed up (see start_warm_up)
+        self.pdf_ready = None
 
     # Method to set up the UI layout
     def setup_ui(self):
@@ -87,9 +125,8 @@ class MainWindow(QMainWindow):
 
         # Add a logo (optional)
         logo_label = QLabel()
-        pixmap = QPixmap("wsc.gif")  # Replace "logo.png" with your image file
+        pixmap = self._logo_pixmap()
         if not pixmap.isNull():
-            pixmap = pixmap.scaled(125, 125, Qt.KeepAspectRatio, Qt.SmoothTransformation)
             logo_label.setPixmap(pixmap)
             logo_label.setAlignment(Qt.AlignCenter)
             layout.addWidget(logo_label)  # Add logo to layout
@@ -118,6 +155,27 @@ class MainWindow(QMainWindow):
         help_action.triggered.connect(self.open_help_url)
         help_menu.addAction(help_action)        
 
+    @classmethod
+    def _logo_pixmap(cls):
+        """
+        Decode and scale the logo the first time it is needed, then reuse it.
+        """
+        if cls._logo is None:
+            pixmap = QPixmap("wsc.gif")  # Replace "logo.png" with your image file
+            if not pixmap.isNull():
+                pixmap = pixmap.scaled(125, 125, Qt.KeepAspectRatio, Qt.SmoothTransformation)
+            cls._logo = pixmap
+        return cls._logo
+
+    def start_warm_up(self):
+        """
+        Get PDF generation ready in the background, once per run. This loads lxml
+        and starts wkhtmltopdf, so it waits until the user has picked a Logger XML.
+        """
+        if self.pdf_ready is None:
+            self.pdf_ready = threading.Event()
+            QThreadPool.globalInstance().start(WarmUpTask(self.pdf_ready))
+
     # Helper method to create buttons
     def create_button(self, layout, text, function):
         """
@@ -146,13 +204,15 @@ class MainWindow(QMainWindow):
             self,                      # Parent widget (the main window)
             "Select Logger XML File",  # Dialog title
             "",                        # Starting directory (empty string defaults to current directory)
-            "XML Files (*.xml);;All Files (*)"  # File filter (to show only .xml files by default)
+            "XML Files (*.xml);;All Files (*)",  # File filter (to show only .xml files by default)
+            options=FILE_DIALOG_OPTIONS  # Skip the per-file icon and symlink lookups
         )
 
         if file_path:  # If a file was selected
             # QMessageBox.information(self, "File Selected", f"You selected: {file_path}")
             # Do something with the .xml file path, e.g., store it or process it
-            self.logger_xml_path = file_path  # Example: Save the file path to a class variable
+            self._paths['xml'] = file_path  # Save the file path for generate_pdf
+            self.start_warm_up()  # Get PDF generation ready while they pick the EVR
         else:
             QMessageBox.warning(self, "No File Selected", "Please select a valid XML file.")
 
@@ -161,7 +221,7 @@ class MainWindow(QMainWindow):
         """
         Prompts the user to select an End Visit Report using a file picker dialog.
         """
-        if not getattr(self, 'logger_xml_path', None):  # Check if logger_xml_path is empty or not set
+        if not self._paths.get('xml'):  # Check if a Logger XML has been loaded
             QMessageBox.warning(self, "Action Blocked", "Please load a Logger XML file first!")
             return
 
@@ -170,13 +230,14 @@ class MainWindow(QMainWindow):
             self,                      # Parent widget (the main window)
             "Select End Visit Report",  # Dialog title
             "",                        # Starting directory (empty string defaults to current directory)
-            "EVR Files (*.txt);;All Files (*)"  # File filter (to show only .txt files by default)
+            "EVR Files (*.txt);;All Files (*)",  # File filter (to show only .txt files by default)
+            options=FILE_DIALOG_OPTIONS  # Skip the per-file icon and symlink lookups
         )
 
         if file_path:  # If a file was selected
             # QMessageBox.information(self, "File Selected", f"You selected: {file_path}")
             # Do something with the .xml file path, e.g., store it or process it
-            self.logger_evr_path = file_path  # Example: Save the file path to a class variable
+            self._paths['evr'] = file_path  # Save the file path for generate_pdf
         else:
             QMessageBox.warning(self, "No File Selected", "Please select a valid End Visit Report.")
 
@@ -187,118 +248,58 @@ class MainWindow(QMainWindow):
         
         :param self: Description
         """
-        if not getattr(self, 'logger_xml_path', None):  # Check if logger_xml_path is empty or not set
+        if not self._paths.get('xml'):  # Check if a Logger XML has been loaded
             QMessageBox.warning(self, "Action Blocked", "Please load a Logger XML file first!")
             return
+
+        from pdfGenerationFunctions import build_config_tree, read_evr, resource_path, xml_to_pdf
         
         # Check for the C:\Temp directory, if not make it
         # We are storing the files the user sees in this directory
-        if not os.path.isdir('C:\\temp\\FTSViewer\\'):
-            # Let's make a dir
-            print('Creating C:\\temp\\FTSViewer\\')
-            os.makedirs('C:\\temp\\FTSViewer\\')
+        out_dir = Path('C:/temp/FTSViewer')
+        out_dir.mkdir(parents=True, exist_ok=True)
+
+        # Name the output files after the Logger XML
+        stem = Path(self._paths['xml']).stem
 
         # Step #1: Determine if we can an EVR file
-        if not getattr(self, 'logger_evr_path', None):  # Check if logger_evr_path is empty or not set
+        evr_path = self._paths.get('evr', "")
+        if not evr_path:  # Check if an End Visit Report has been loaded
             print("No EVR file loaded, proceeding with XML only.")
-            evr_path = ""
         else:
-            evr_path = self.logger_evr_path
             print(f"Using EVR file: {evr_path}")
                     # Call the EVR Function
         
             # Read in the End Visit Report EVR
             print('Attempting to Open: ' + evr_path)
         
-            # list of information that we want out of the file
-            searchitems = ['Logger Model:','Logger Version:','Serial Number:','OS Version:','Software Version:','Serial#:','SW Ver:','Device Type:','Standard:','Antenna Bearing:','Antenna Inclination:']
-        
-            # make a output file for when we find the test we want
-            evr_output=[]
+            # Point the program to the file, and pull out what we need
+            evr_output = read_evr(evr_path)
 
-            # Point the program to the file, and open it for reading
-            with open(evr_path, "r") as f:
-                #Read in the file
-                searchlines = f.readlines()
-        
-            # a simple counter
-            count = 0
-
-            # Cycle through the lines of the file
-            for i, line in enumerate(searchlines):
-            
-                # Look for any of the words in the list
-                for word in searchitems:
-        
-                    if word in line: # We found one of the search items
-                
-                        # Build up the output, without the \n, for the final output
-                        # we are going to develop some xml here
-                        current_output = line.split(":",1)
-                        leftout = current_output[0]
-                    
-                        # We have to do some extra in case the word has #
-                        # if not, just do it regularly
-                        leftout = leftout.replace("Serial#","Serial")
-                    
-                        # It is possible to have two instances of "Device Type" and xml doesn't like that
-                        if leftout.find("Device Type") != -1:
-                            # found one, up the count
-                            count += 1
-                            #print (count)
-
-                            if count==2:
-                                # We have a second instance of Device Type
-                                # add a 2 to the end of the device type
-                                leftout=leftout + '2'
-
-                        # create the attribute information
-                        rightout = "\"" + current_output[1].strip() + "\" "
-
-                        # Add the tag to the file
-                        evr_output.append(leftout.replace(" ","") + "=" + rightout)
-
-            # Close the file
-            f.close()
             print("EVR Data Extracted:")
         
-        # Step #2: Read in the original XML file
-        xml_file = open(self.logger_xml_path, 'r')
-        # Skip the first two lines - we add them later!
-        xml_file.readline()
-        xml_file.readline()
-        xml_content = xml_file.read() # Read the rest of the file
-        xml_file.close() # Close the file
-
-
-        newfilename = 'C:\\temp\\FTSViewer\\' + os.path.basename(self.logger_xml_path)
-        newfilename = newfilename[0:len(newfilename)-4]
-        newfilename = newfilename + "_FTSConfigViewer.xml"
-        print('Creating newfile: ' + newfilename)
-        newfile = open(newfilename,'w')
-        
-        # Step 2b: add the XML Declaration and XSLT reference
-        newfile.write('<?xml version="1.0" encoding="utf-8"?><XMLRoot>')
-        
-        # Step 3: add the EVR to the newfile
+        # Step #2: Read in the original XML file and add the EVR to it
             # If there is NO EVR LOADED, SKIP THIS!!!
+        try:
+            config_tree = build_config_tree(self._paths['xml'], evr_output if os.path.isfile(evr_path) else None)
+        except Exception as e:
+            print("Error reading Logger XML:", e)
+            return
 
-        if os.path.isfile(evr_path):
-            # Append the File with the NEW data
-            newfile.write('<VisitReport ')
-            newfile.write(''.join(evr_output))
-            newfile.write('></VisitReport>')
-
-        # Step 4: Append the original XML content
-        newfile.write(xml_content)  # Append the original XML content
-        newfile.close() # Close the new file
+        # Only write the merged XML out when we want it for debugging
+        if SAVE_MERGED_XML:
+            newfilename = out_dir / f"{stem}_FTSConfigViewer.xml"
+            print(f'Creating newfile: {newfilename}')
+            config_tree.write(str(newfilename), xml_declaration=True, encoding="utf-8")
 
-        
-        # Step 5: Now generate the PDF
+        # Step 3: Now generate the PDF
+        # (only waits if the user beat the warm up)
+        self.start_warm_up()
+        self.pdf_ready.wait()
         try:    
-            pdf_path = os.path.basename(self.logger_xml_path)[0:len(os.path.basename(self.logger_xml_path))-4] + '_FTSConfigViewer.pdf'
-            xml_to_pdf(newfilename, "FTSConfigViewer.xsl", 'C:\\temp\\FTSViewer\\' + pdf_path)
-            os.startfile('C:\\temp\\FTSViewer\\' + pdf_path) # Open the generated PDF file
+            pdf_path = out_dir / f"{stem}_FTSConfigViewer.pdf"
+            xml_to_pdf(config_tree, resource_path(XSL_FILE), str(pdf_path))
+            os.startfile(pdf_path) # Open the generated PDF file
 
         except Exception as e:
             print("Error generating PDF:", e)
@@ -309,8 +310,7 @@ class MainWindow(QMainWindow):
         Resets the file paths for Logger XML and End Visit Report.
         """
         # Clear the paths
-        self.logger_xml_path = ""
-        self.end_visit_report_path = ""
+        self._paths.clear()
         # Provide feedback to the user
         QMessageBox.information(self, "Reset Successful", "Reset successful. You can load new files now.")
 
@@ -324,9 +324,19 @@ class MainWindow(QMainWindow):
 
 # Boilerplate code to run the PyQt application
 if __name__ == "__main__":
+    # Let the cached logo pixmap render sharply on high DPI screens
+    QApplication.setAttribute(Qt.AA_UseHighDpiPixmaps)
+    # Only the main window needs a native window handle, and it has no "?" button
+    QApplication.setAttribute(Qt.AA_DontCreateNativeWidgetSiblings)
+    QApplication.setAttribute(Qt.AA_DisableWindowContextHelpButton)
     app = QApplication(sys.argv)
 
+    # Time how long it takes to get the window up
+    startup_timer = QElapsedTimer()
+    startup_timer.start()
     window = MainWindow()
     window.show()
+    if TIME_STARTUP:
+        print(f"Window shown in {startup_timer.elapsed()} ms")
 
     sys.exit(app.exec_())
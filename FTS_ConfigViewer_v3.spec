@@ -1,4 +1,12 @@
 # -*- mode: python ; coding: utf-8 -*-
+import os
+import sys
+from pathlib import Path
+
+# Build FTSConfigViewer.xsl.bin from the stylesheet so it can be bundled below
+sys.path.insert(0, os.path.join(SPECPATH, 'tools'))
+from precompile_xsl import precompile
+precompile(Path(SPECPATH) / 'FTSConfigViewer.xsl')
 
 
 block_cipher = None
@@ -8,7 +16,7 @@ a = Analysis(
     ['FTS_ConfigViewer_v3.py'],
     pathex=[],
     binaries=[],
-    datas=[('bin/wkhtmltopdf.exe', 'bin'), ('samples/*', 'samples')],
+    datas=[('bin/wkhtmltopdf.exe', 'bin'), ('FTSConfigViewer.xsl', '.'), ('FTSConfigViewer.xsl.bin', '.'), ('samples/*', 'samples')],
     hiddenimports=[],
     hookspath=[],
     hooksconfig={},
@@ -1,7 +1,13 @@
-import pdfkit
 from lxml import etree
+import atexit
+import mmap
 import os
+import queue
+import re
+import subprocess
 import sys
+import threading
+import time
 
 def resource_path(relative_path):
     """
@@ -11,67 +17,318 @@ def resource_path(relative_path):
     return os.path.join(base_path, relative_path)
 
 
-def xml_to_html(xml_path, xsl_path, output_html_path):
+# Compiled stylesheets, keyed by (xsl_path, modification time)
+_XSLT_CACHE = {}
+
+# A single parser shared by every parse
+_PARSER = etree.XMLParser(huge_tree=True, collect_ids=False)
+
+# Parser for the logger XML: the indentation between elements is never shown,
+# so it is dropped rather than kept as a text node in the tree
+_CONFIG_PARSER = etree.XMLParser(huge_tree=True, collect_ids=False, remove_blank_text=True)
+
+# Intermediate HTML file path
+HTML_PATH = "C:/temp/FTSViewer/Sample_Config.html"
+
+# The persistent wkhtmltopdf always renders to this ASCII-only name, since it
+# decodes its job lines with the ANSI code page; the PDF is then moved into place
+WORKER_PDF_PATH = "C:/temp/FTSViewer/FTSConfigViewer_render.pdf"
+
+# How long to wait for wkhtmltopdf to finish one PDF, in seconds
+WKHTMLTOPDF_TIMEOUT = 120
+
+# Where wkhtmltopdf keeps its web cache between PDFs
+WKHTMLTOPDF_CACHE_DIR = "C:/temp/FTSViewer/wk_cache"
+
+# Characters XML 1.0 does not allow (lxml refuses attribute values containing them)
+_XML_INVALID_RE = re.compile("[^\t\n\r\u0020-\ud7ff\ue000-\ufffd\U00010000-\U0010ffff]")
+
+# Page settings passed to wkhtmltopdf
+WKHTMLTOPDF_OPTIONS = [
+    '--orientation', 'Landscape',
+    '--page-size', 'Letter',
+    '--margin-top', '5mm',
+    '--margin-bottom', '5mm',
+    '--margin-left', '5mm',
+    '--margin-right', '5mm',
+    '--zoom', '1',
+    '--cache-dir', WKHTMLTOPDF_CACHE_DIR,
+    '--disable-smart-shrinking',
+    '--load-error-handling', 'ignore',
+]
+
+# Keep wkhtmltopdf from flashing a console window on Windows
+_CREATION_FLAGS = getattr(subprocess, "CREATE_NO_WINDOW", 0)
+
+# The long-lived wkhtmltopdf process, started on first use, and its stderr lines
+_WORKER = None
+_WORKER_OUTPUT = None
+_WORKER_LOCK = threading.Lock()
+
+
+def get_transform(xsl_path):
+    """
+    Return the compiled XSLT for xsl_path, compiling it only when the file is new or has changed.
+    A pre-serialized copy from tools/precompile_xsl.py is used instead when one is bundled,
+    or, running from source, when it is at least as new as the stylesheet.
+    """
+    bin_path = xsl_path + ".bin"
+    if os.path.isfile(bin_path) and (
+        hasattr(sys, '_MEIPASS')  # Built by the spec from the bundled .xsl; extraction mtimes mean nothing
+        or os.path.getmtime(bin_path) >= os.path.getmtime(xsl_path)
+    ):
+        xsl_path = bin_path
+
+    key = (xsl_path, os.path.getmtime(xsl_path))
+    transform = _XSLT_CACHE.get(key)
+    if transform is None:
+        transform = _XSLT_CACHE.setdefault(key, etree.XSLT(etree.parse(xsl_path, _PARSER)))
+    return transform
+
+
+# list of information that we want out of the End Visit Report
+EVR_SEARCH_ITEMS = ['Logger Model:','Logger Version:','Serial Number:','OS Version:','Software Version:','Serial#:','SW Ver:','Device Type:','Standard:','Antenna Bearing:','Antenna Inclination:']
+
+# One compiled pattern over the raw report: a search item at the start of a line, then the rest of the line
+EVR_SEARCH_RE = re.compile(
+    rb"^[ \t]*(?P<key>" + b"|".join(re.escape(item[:-1].encode()) for item in EVR_SEARCH_ITEMS) + rb")[ \t]*:(?P<value>[^\r\n]*)",
+    re.MULTILINE,
+)
+
+
+def parse_evr(buf):
+    """
+    Pull the EVR_SEARCH_ITEMS out of the raw bytes (or memory map) of an End Visit Report.
+    Returns the VisitReport attributes, keyed by attribute name.
+    """
+    # the VisitReport attributes we find, keyed by attribute name
+    evr_output = {}
+
+    # how many times each search item has been seen
+    counts = {}
+
+    for match in EVR_SEARCH_RE.finditer(buf):
+        item = match.group("key")
+        counts[item] = counts.get(item, 0) + 1
+
+        # Attribute names can't have spaces or #
+        leftout = item.translate(None, b" #").decode("ascii")
+
+        # It is possible to have two instances of "Device Type" and xml doesn't like that
+        if item == b"Device Type" and counts[item] == 2:
+            # We have a second instance of Device Type
+            # add a 2 to the end of the device type
+            leftout = leftout + "2"
+
+        # Add the attribute for the VisitReport; a field that repeats (e.g. a
+        # third telemetry) keeps its first value rather than overwriting it
+        evr_output.setdefault(leftout, match.group("value").strip().decode("utf-8", errors="replace"))
+
+    return evr_output
+
+
+def read_evr(evr_path):
+    """
+    Memory map the End Visit Report and parse it, so only the matched values are copied and decoded.
+    """
+    with open(evr_path, "rb") as f:
+        # mmap can't map an empty file
+        if os.fstat(f.fileno()).st_size == 0:
+            return {}
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            return parse_evr(mm)
+
+
+def build_config_tree(xml_path, visit_report=None):
+    """
+    Parse the logger XML and, when given, add the End Visit Report attributes
+    as a VisitReport element at the top of the XMLRoot.
+    """
+    # libxml2 reads the file in chunks, so the source text is never held in memory
+    tree = etree.parse(xml_path, _CONFIG_PARSER)
+    if visit_report is not None:
+        vr = etree.Element("VisitReport")
+        for name, value in visit_report.items():
+            # lxml escapes quotes, & and < itself; only drop what XML can't hold at all
+            vr.set(name, _XML_INVALID_RE.sub("", value))
+        tree.getroot().insert(0, vr)
+    return tree
+
+
+def transform_xml(xml, xsl_path):
+    """
+    Transform the XML using the compiled XSLT and return the HTML result tree.
+    xml can be a file path or an already parsed tree.
+    """
+    # Parse the XML (if needed) and fetch the compiled stylesheet
+    if not isinstance(xml, etree._ElementTree):
+        xml = etree.parse(xml, _CONFIG_PARSER)
+    transform = get_transform(xsl_path)
+
+    # Perform the transformation
+    return transform(xml)
+
+
+def xml_to_html(xml, xsl_path, output_html_path):
     """
     Transform the XML using XSLT to produce a fully rendered HTML file.
+    xml can be a file path or an already parsed tree.
+    Returns the HTML result tree, or None if the transform failed.
     """
     try:
-        # Parse the XML and XSL files
-        xml = etree.parse(xml_path)
-        xsl = etree.parse(xsl_path)
-
-        # Perform the transformation
-        transform = etree.XSLT(xsl)
-        result_tree = transform(xml)
+        result_tree = transform_xml(xml, xsl_path)
 
-        # Write the HTML output to a file
+        # Write the HTML output to a file; bytes() serializes it as HTML, and the
+        # stylesheet has no <xsl:output>, so write_output can't be used
         with open(output_html_path, "wb") as html_file:
-            html_file.write(etree.tostring(result_tree, pretty_print=True, encoding="UTF-8"))
+            html_file.write(bytes(result_tree))
         
         print(f"HTML successfully generated: {output_html_path}")
-        return output_html_path
+        return result_tree
     except Exception as e:
         print(f"Error transforming XML to HTML: {e}")
         return None
 
+def _ensure_worker():
+    """
+    Start the persistent wkhtmltopdf process if it is not already running.
+    Jobs are fed to it on stdin so the rendering engine only starts once.
+    """
+    global _WORKER, _WORKER_OUTPUT
+    with _WORKER_LOCK:
+        if _WORKER is None or _WORKER.poll() is not None:
+            wkhtmltopdf_path = resource_path("bin/wkhtmltopdf.exe")
+            os.makedirs(WKHTMLTOPDF_CACHE_DIR, exist_ok=True)
+            _WORKER = subprocess.Popen(
+                [wkhtmltopdf_path, '--read-args-from-stdin', *WKHTMLTOPDF_OPTIONS],
+                stdin=subprocess.PIPE,
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.PIPE,
+                text=True,
+                errors="replace",
+                creationflags=_CREATION_FLAGS,
+            )
+            _WORKER_OUTPUT = queue.Queue()
+            threading.Thread(target=_pump_stderr, args=(_WORKER, _WORKER_OUTPUT), daemon=True).start()
+        return _WORKER
+
+
+def _pump_stderr(worker, output):
+    """
+    Copy the worker's stderr into a queue, so html_to_pdf can wait on it with a timeout.
+    """
+    for line in worker.stderr:
+        output.put(line)
+    output.put(None)  # The process has exited
+
+
+def _quote_arg(arg):
+    """
+    Quote an argument for a --read-args-from-stdin job line. wkhtmltopdf splits
+    those lines itself and treats \\ as an escape even inside double quotes.
+    """
+    return '"' + str(arg).replace('\\', '\\\\').replace('"', '\\"') + '"'
+
+
+def _stop_worker():
+    """
+    Close the persistent wkhtmltopdf process when the application exits.
+    """
+    if _WORKER is not None and _WORKER.poll() is None:
+        _WORKER.stdin.close()
+        _WORKER.wait()
+
+
+atexit.register(_stop_worker)
+
+
+def warm_up(xsl_path):
+    """
+    Start wkhtmltopdf and compile the stylesheet ahead of the first PDF.
+    """
+    try:
+        get_transform(xsl_path)
+        _ensure_worker()
+    except Exception as e:
+        print(f"Error preparing PDF generation: {e}")
+
+
 def html_to_pdf(html_path, output_pdf_path):
     """
-    Convert the rendered HTML file to a PDF using wkhtmltopdf.
+    Convert the rendered HTML file to a PDF using the persistent wkhtmltopdf process.
     """
     try:
+        worker = _ensure_worker()
+        errors = []
+        with _WORKER_LOCK:
+            output = _WORKER_OUTPUT
+            worker.stdin.write(f'{_quote_arg(html_path)} {_quote_arg(WORKER_PDF_PATH)}\n')
+            worker.stdin.flush()
+
+            # wkhtmltopdf reports progress on stderr and finishes every job with "Done"
+            deadline = time.monotonic() + WKHTMLTOPDF_TIMEOUT
+            while True:
+                try:
+                    line = output.get(timeout=max(0, deadline - time.monotonic()))
+                except queue.Empty:
+                    # Don't leave the UI waiting on a wedged process; the next PDF starts a new one
+                    worker.kill()
+                    raise RuntimeError(f"wkhtmltopdf did not finish within {WKHTMLTOPDF_TIMEOUT} seconds")
+                if line is None:
+                    raise RuntimeError("wkhtmltopdf exited unexpectedly")
+                if line.startswith("Done"):
+                    break
+                if "Error" in line or "Exit with code" in line:
+                    errors.append(line.strip())
 
-        options = {
-            'orientation': 'Landscape',
-            'page-size': 'Letter',
-            'margin-top': '5mm',
-            'margin-bottom': '5mm',
-            'margin-left': '5mm',
-            'margin-right': '5mm',
-            'zoom': 1
-            }
+        if errors:
+            raise RuntimeError("; ".join(errors))
+        os.replace(WORKER_PDF_PATH, output_pdf_path)
+        print(f"PDF successfully created: {output_pdf_path}")
+        return True
+    except Exception as e:
+        print(f"Error converting HTML to PDF: {e}")
+        return False
+
+
+def html_bytes_to_pdf(html, output_pdf_path):
+    """
+    Convert HTML held in memory to a PDF with a one-off wkhtmltopdf,
+    piping the HTML in on stdin instead of going through a file.
+    """
+    try:
         wkhtmltopdf_path = resource_path("bin/wkhtmltopdf.exe")
-        config = pdfkit.configuration(wkhtmltopdf=wkhtmltopdf_path)
-        
-        pdfkit.from_file(html_path, output_pdf_path, options=options, configuration=config)
+        os.makedirs(WKHTMLTOPDF_CACHE_DIR, exist_ok=True)
+        subprocess.run(
+            [wkhtmltopdf_path, '--quiet', *WKHTMLTOPDF_OPTIONS, '-', output_pdf_path],
+            input=html,
+            check=True,
+            timeout=WKHTMLTOPDF_TIMEOUT,
+            creationflags=_CREATION_FLAGS,
+        )
         print(f"PDF successfully created: {output_pdf_path}")
+        return True
     except Exception as e:
         print(f"Error converting HTML to PDF: {e}")
+        return False
 
-def xml_to_pdf(xml_path, xsl_path, pdf_path):
+def xml_to_pdf(xml, xsl_path, pdf_path):
     """
     Full workflow: transform XML to HTML, then convert HTML to PDF.
+    xml can be a file path or an already parsed tree.
     """
-    # Intermediate HTML file path
-    html_path = "C:/temp/FTSViewer/Sample_Config.html"
-    
     # Step 1: Convert XML to HTML
-    generated_html_path = xml_to_html(xml_path, xsl_path, html_path)
-    if not generated_html_path:
+    html_path = HTML_PATH
+    result_tree = xml_to_html(xml, xsl_path, html_path)
+    if result_tree is None:
         print("Failed to generate HTML from XML and XSL.")
         return
 
     # Step 2: Convert HTML to PDF
-    html_to_pdf(generated_html_path, pdf_path)
+    if not html_to_pdf(html_path, pdf_path):
+        # The persistent wkhtmltopdf failed, so pipe the HTML we still have
+        # in memory straight into a one-off wkhtmltopdf instead
+        html_bytes_to_pdf(bytes(result_tree), pdf_path)
 
 
 """
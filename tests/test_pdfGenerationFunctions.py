@@ -0,0 +1,177 @@
+import io
+import os
+import queue
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from lxml import etree
+
+import pdfGenerationFunctions
+from pdfGenerationFunctions import build_config_tree, parse_evr, read_evr, xml_to_html, xml_to_pdf
+
+SAMPLE_XML = os.path.join(ROOT, "samples", "Sample_Config.xml")
+SAMPLE_EVR = os.path.join(ROOT, "samples", "Sample_EVR.txt")
+
+sys.path.insert(0, os.path.join(ROOT, "tools"))
+from precompile_xsl import precompile
+XSL_FILE = os.path.join(ROOT, "FTSConfigViewer.xsl")
+
+SAMPLE_EVR_ATTRIBUTES = {
+    "LoggerModel": "H1-RS-G6-TLM",
+    "LoggerVersion": "2",
+    "SerialNumber": "106691, Mfg Date: 02/26/2019",
+    "OSVersion": "3.11",
+    "SoftwareVersion": "3.11.0.14, Firmware Version: 18",
+    "DeviceType": "G6",
+    "Standard": "CS2",
+    "Serial": "19070086",
+    "SWVer": "11.11 2018/12/06",
+    "AntennaBearing": "174° True",
+    "AntennaInclination": "38°",
+    "DeviceType2": "FTS",
+}
+
+
+def test_read_evr_sample():
+    assert read_evr(SAMPLE_EVR) == SAMPLE_EVR_ATTRIBUTES
+
+
+def test_parse_evr_crlf_line_endings():
+    with open(SAMPLE_EVR, "rb") as f:
+        buf = f.read().replace(b"\r\n", b"\n").replace(b"\n", b"\r\n")
+
+    assert parse_evr(buf) == SAMPLE_EVR_ATTRIBUTES
+
+
+def test_parse_evr_empty_field_does_not_take_next_line():
+    assert parse_evr(b"Logger Model:\nOS Version: 3.11\n") == {"LoggerModel": "", "OSVersion": "3.11"}
+
+
+def test_parse_evr_second_device_type():
+    buf = b"Device Type: G6\nSerial#: 1\nDevice Type: FTS\n"
+
+    assert parse_evr(buf) == {"DeviceType": "G6", "Serial": "1", "DeviceType2": "FTS"}
+
+
+def test_parse_evr_repeated_fields_keep_first_value():
+    buf = (
+        b"Device Type: A\nSerial#: 1\nSW Ver: 1.0\n"
+        b"Device Type: B\nSerial#: 2\nSW Ver: 2.0\n"
+        b"Device Type: C\nSerial#: 3\nSW Ver: 3.0\n"
+    )
+
+    assert parse_evr(buf) == {"DeviceType": "A", "Serial": "1", "SWVer": "1.0", "DeviceType2": "B"}
+
+
+def test_read_evr_empty_file(tmp_path):
+    evr_path = tmp_path / "empty.txt"
+    evr_path.write_bytes(b"")
+
+    assert read_evr(str(evr_path)) == {}
+
+
+def test_xml_to_html_renders_sample_config(tmp_path):
+    html_path = tmp_path / "Sample_Config.html"
+
+    assert xml_to_html(SAMPLE_XML, XSL_FILE, str(html_path)) is not None
+
+    html = html_path.read_bytes()
+    assert html.startswith(b"<html>")
+    assert b"Water Survey of Canada" in html
+
+
+def test_xml_to_html_renders_visit_report(tmp_path):
+    html_path = tmp_path / "Sample_Config.html"
+    tree = build_config_tree(SAMPLE_XML, {"LoggerModel": "H1-RS-G6-TLM", "OSVersion": "3.11 °"})
+
+    assert xml_to_html(tree, XSL_FILE, str(html_path)) is not None
+
+    html = html_path.read_bytes()
+    assert b"H1-RS-G6-TLM" in html
+    assert "3.11 °".encode("utf-8") in html
+
+
+def test_xml_to_pdf_hands_html_to_wkhtmltopdf(tmp_path, monkeypatch):
+    html_path = tmp_path / "Sample_Config.html"
+    calls = []
+    monkeypatch.setattr(pdfGenerationFunctions, "HTML_PATH", str(html_path))
+    monkeypatch.setattr(pdfGenerationFunctions, "html_to_pdf", lambda html, pdf: calls.append(("worker", html, pdf)) or False)
+    monkeypatch.setattr(pdfGenerationFunctions, "html_bytes_to_pdf", lambda html, pdf: calls.append(("pipe", html, pdf)) or True)
+
+    xml_to_pdf(SAMPLE_XML, XSL_FILE, "out.pdf")
+
+    assert calls[0] == ("worker", str(html_path), "out.pdf")
+    assert calls[1] == ("pipe", html_path.read_bytes(), "out.pdf")
+
+
+def test_quote_arg_escapes_windows_paths():
+    assert pdfGenerationFunctions._quote_arg('C:\\temp\\FTSViewer\\a "b".pdf') == '"C:\\\\temp\\\\FTSViewer\\\\a \\"b\\".pdf"'
+
+
+class FakeWorker:
+    def __init__(self):
+        self.stdin = io.StringIO()
+        self.killed = False
+
+    def kill(self):
+        self.killed = True
+
+
+def use_fake_worker(monkeypatch, *lines):
+    worker = FakeWorker()
+    output = queue.Queue()
+    for line in lines:
+        output.put(line)
+    monkeypatch.setattr(pdfGenerationFunctions, "_ensure_worker", lambda: worker)
+    monkeypatch.setattr(pdfGenerationFunctions, "_WORKER_OUTPUT", output)
+    return worker
+
+
+def test_html_to_pdf_renders_to_ascii_name_then_moves(tmp_path, monkeypatch):
+    render_path = tmp_path / "render.pdf"
+    render_path.write_bytes(b"%PDF")
+    monkeypatch.setattr(pdfGenerationFunctions, "WORKER_PDF_PATH", str(render_path))
+    worker = use_fake_worker(monkeypatch, "Loading pages\n", "Done\n")
+    pdf_path = tmp_path / "Station_é_FTSConfigViewer.pdf"
+
+    assert pdfGenerationFunctions.html_to_pdf("page.html", str(pdf_path))
+
+    assert "é" not in worker.stdin.getvalue()
+    assert pdf_path.read_bytes() == b"%PDF"
+    assert not render_path.exists()
+
+
+def test_html_to_pdf_times_out_on_wedged_worker(monkeypatch):
+    monkeypatch.setattr(pdfGenerationFunctions, "WKHTMLTOPDF_TIMEOUT", 0.01)
+    worker = use_fake_worker(monkeypatch, "Loading pages\n")
+
+    assert not pdfGenerationFunctions.html_to_pdf("page.html", "out.pdf")
+    assert worker.killed
+
+
+def test_precompiled_stylesheet_renders_the_same_text(tmp_path):
+    xsl_path = tmp_path / "FTSConfigViewer.xsl"
+    xsl_path.write_bytes(open(XSL_FILE, "rb").read())
+    bin_path = precompile(xsl_path)
+
+    config = etree.parse(SAMPLE_XML)
+    original = bytes(etree.XSLT(etree.parse(str(xsl_path)))(config))
+    precompiled = bytes(etree.XSLT(etree.parse(str(bin_path)))(config))
+
+    assert precompiled.split() == original.split()
+
+
+def test_get_transform_prefers_bundled_bin(tmp_path, monkeypatch):
+    stylesheet = '<xsl:stylesheet version="1.0" xmlns:xsl="http://www.w3.org/1999/XSL/Transform"><xsl:template match="/"><p>{}</p></xsl:template></xsl:stylesheet>'
+    xsl_path = tmp_path / "FTSConfigViewer.xsl"
+    bin_path = tmp_path / "FTSConfigViewer.xsl.bin"
+    bin_path.write_text(stylesheet.format("bin"))
+    xsl_path.write_text(stylesheet.format("xsl"))
+    os.utime(bin_path, (0, 0))  # Extracted before the .xsl
+    monkeypatch.setattr(sys, "_MEIPASS", str(tmp_path), raising=False)
+
+    result = pdfGenerationFunctions.get_transform(str(xsl_path))(etree.fromstring("<x/>"))
+
+    assert b"<p>bin</p>" in bytes(result)
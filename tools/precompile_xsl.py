@@ -0,0 +1,30 @@
+# Pre-serialize FTSConfigViewer.xsl for the viewer
+# FTS_ConfigViewer_v3.spec runs this on every PyInstaller build; it can also be
+# run by hand from the repository root:
+#     python tools/precompile_xsl.py
+# Writes FTSConfigViewer.xsl.bin, a copy of the stylesheet with its comments
+# stripped, which pdfGenerationFunctions.get_transform loads in preference
+# to the .xsl when it is bundled (or, from source, at least as new).
+
+from pathlib import Path
+from lxml import etree
+
+XSL_FILE = Path("FTSConfigViewer.xsl")
+
+
+def precompile(xsl_path=XSL_FILE):
+    """
+    Parse the stylesheet once and write the serialized tree next to it.
+    """
+    parser = etree.XMLParser(remove_comments=True)
+    xsl_tree = etree.parse(str(xsl_path), parser)
+    etree.XSLT(xsl_tree)  # Make sure it still compiles before shipping it
+
+    bin_path = xsl_path.with_name(xsl_path.name + ".bin")
+    bin_path.write_bytes(etree.tostring(xsl_tree, xml_declaration=True, encoding="UTF-8"))
+    print(f"Stylesheet written: {bin_path}")
+    return bin_path
+
+
+if __name__ == "__main__":
+    precompile()